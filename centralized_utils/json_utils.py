@@ -0,0 +1,44 @@
+'''
+JSON encoding shared by the loggers and uploaders.
+The fastest installed backend is picked once at import: orjson > ujson > stdlib json.
+Install the "fast" extra (pip install .[fast]) to get orjson.
+
+All backends produce compact, UTF-8 output that parses to the same values, but the exact bytes can differ between them:
+floats in exponent form are spelled differently (orjson writes 1e16, stdlib json 1e+16), and non-finite floats are
+handled differently (orjson writes null, stdlib json writes NaN/Infinity, and ujson depends on its version).
+'''
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+if orjson is not None:
+    BACKEND = 'orjson'
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+elif ujson is not None:
+    BACKEND = 'ujson'
+
+    def dumps(obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+else:
+    BACKEND = 'json'
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_str(obj) -> str:
+    '''Same as dumps(), decoded to str (for text streams such as logging).'''
+    return dumps(obj).decode('utf-8')
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import time
+import logging
+from typing import Optional, Union, List, Dict
+from .json_utils import dumps_str as _dumps
+
+
+# CloudWatch metric definitions. These never change, so they are built once and shared by every payload.
+_METRICS_RESPONSE_TIME = [{"Name": "ResponseTime", "Unit": "Milliseconds"}]
+_METRICS_SUCCESS = [{"Name": "ResponseTime", "Unit": "Milliseconds"}, {"Name": "ProductCount", "Unit": "Count"}]
+_METRICS_REQUEST_COUNT = [{"Name": "RequestCount", "Unit": "Count"}]
+_METRICS_PRODUCT_COUNT = [{"Name": "ProductCount", "Unit": "Count"}]
+
+# HTTP statuses that mean the proxy was blocked/throttled, rather than the scraper failing.
+_PROXY_ISSUE_STATUSES = frozenset({403, 429})
+
+# Format string for informational messages, framed by "*" banners and padded above and below.
+_BANNER = '*' * 91
+_BANNER_FORMAT = f'\n{_BANNER}\n%s\n{_BANNER}\n'
+
+# Rename the INFO level once, at import, instead of on every controller instantiation.
+logging.addLevelName(logging.INFO, "Patrick")
+
+_LOGGER_NAME = 'centralized_utils.emf'
+
+
+def _setup_logging() -> logging.Logger:
+    """Configure logging for the main script"""
+    # Dedicated logger that does not propagate to root: EMF lines are only written by our own handler,
+    # which skips the root handler chain and avoids duplicates when the application configures root logging.
+    logger = logging.getLogger(_LOGGER_NAME)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        ch.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(ch)
+    return logger
+
+
+# Python logger shared by all controllers, configured once at import.
+_py_logger = _setup_logging()
+
+
+class LogControllerBase:
+    '''
+    Shared implementation of the CloudWatch EMF log controllers.
+    scraper_utils.AWSLogger and centralized_utils.logger_v1.LogController are thin subclasses of this class.
+    '''
+
+    __slots__ = (
+        'namespace', 'py_logger', '_info', 'scraper_name', 'emf_dimensions',
+        '_cw_metrics_response_time', '_cw_metrics_success', '_cw_metrics_request_count', '_cw_metrics_product_count',
+        'last_emf_record',
+    )
+
+    # Name of log_request's urls argument in the public API, used in error messages.
+    _URLS_ARG_NAME = 'source_urls'
+
+    def __init__(self, scraper_name: str):
+        """namespace: Shared CloudWatch namespace for metrics."""
+        self.namespace = 'ws_main_v2'
+        self.py_logger = _py_logger
+        self._info = self.py_logger.info     # Bound once, used by every log method.
+        self.scraper_name = scraper_name
+        self.emf_dimensions = [["Outcome", "Retailer", "ProxyId"]]
+
+        # Pre-built "CloudWatchMetrics" blocks, reused by every emitted payload.
+        self._cw_metrics_response_time = self._build_cw_metrics(_METRICS_RESPONSE_TIME)
+        self._cw_metrics_success = self._build_cw_metrics(_METRICS_SUCCESS)
+        self._cw_metrics_request_count = self._build_cw_metrics(_METRICS_REQUEST_COUNT)
+        self._cw_metrics_product_count = self._build_cw_metrics(_METRICS_PRODUCT_COUNT)
+
+        # Last EMF payload emitted (for log_request with multiple urls, the one of the last url). Used to generate the samples.
+        self.last_emf_record: Optional[dict] = None
+
+    def _build_cw_metrics(self, metrics: list) -> list:
+        return [{"Namespace": self.namespace, "Dimensions": self.emf_dimensions, "Metrics": metrics}]
+
+    def _emit(self, payload: dict):
+        """Print a single EMF payload, padded with blank lines for visual separation."""
+        self._info('\n\n%s\n\n', _dumps(payload))
+        self.last_emf_record = payload
+
+    def log_request(
+        self,
+        total_product_count: int,
+        sanitized_product_count: int,
+        response_time_ms: Optional[float],
+        status: Optional[int],
+        error_msg: Optional[str],
+        source_urls: List[str],
+        proxy_id: str,
+    ) -> str:
+        """
+        Emits EMF payloads for CloudWatch.
+        This function will log one of the following request outcomes:
+            1. success
+            2. proxy_issue
+            3. scraper_issue
+        
+        If outcome == "success", emits an extra ProductCount metric.
+
+        Scraper Variations in regards to how they handle Redis URLs, and then how these effect log behaviour:
+            1. Product URLs based: Redis contains Product URLs, redis goes down by 1, scraper makes 1 request, extracts 1 product, emits 1 log outcome "success/proxy_issue/scraper_issue". Example: ws_oreilly_m9, ws_amazon_m1
+            2. Pagination URLs based: Redis contains Pagination URLs, redis goes down by 1, scraper makes 1 request, extracts multiple (e.g. 15) products, emits 1 log outcome "success/proxy_issue/scraper_issue". Example: ws_rockauto_m2, ws_finditparts_m4, ws_walmart_m4
+            3. Bulk APIs based: Redis contains Product URLs/IDs, redis goes down by bulk (e.g. 50), scraper makes 1 request to a bulk API, extracts 50 products, emits 50 log outcomes "success/proxy_issue/scraper_issue". e.g. ws_fleetpride_m1, ws_autozone_m2.
+        """
+
+        # --- Value Assertions ---
+        # bool is a subclass of int, but is never a valid count.
+        if not isinstance(total_product_count, int) or isinstance(total_product_count, bool):
+            raise ValueError(f'total_product_count must be int, received: {type(total_product_count)}')
+        # --- Value Assertions ---
+        if not isinstance(sanitized_product_count, int) or isinstance(sanitized_product_count, bool):
+            raise ValueError(f'sanitized_product_count must be int, received: {type(sanitized_product_count)}')
+        if not proxy_id or not source_urls:
+            raise ValueError("Both 'proxy_id' and 'urls' must be provided.")
+        if not isinstance(source_urls, list):
+            raise ValueError(f'{self._URLS_ARG_NAME} must be list[str], received: {type(source_urls)}')
+
+        # --- Normalize response_time ---
+        if response_time_ms is None:
+            response_time_ms = 0.0
+
+        # --- Calculate sanitization rate ---
+        sanitization_rate = (sanitized_product_count / total_product_count * 100) if total_product_count else 0
+
+        # --- Determine outcome ---
+        if status == 200 and sanitization_rate >= 50.0 and sanitized_product_count > 0:
+            outcome = 'success'
+        elif status in _PROXY_ISSUE_STATUSES or (error_msg and 'Failed to perform, curl' in error_msg):
+            outcome = 'proxy_issue'
+        else:
+            outcome = 'scraper_issue'
+
+        # --- Calculate Number of Logs that we need to emit ---
+        # The number of logs we emit, must be equal to the number of urls that were popped from redis, even if all those urls were scraped using a single API request.
+        emit_multiple_logs = True if len(source_urls) > 1 else False
+        if emit_multiple_logs:
+            # Log outcome for each source_url. (Scraper Variation 3)
+            number_of_logs_to_emit = len(source_urls)
+        else:
+            # Log single outcome (Scraper Variation 1 and 2)
+            number_of_logs_to_emit = 1
+
+        # --- Pick metric definitions ---
+        # Only for success, include additional ProductCount metric
+        cw_metrics = self._cw_metrics_success if outcome == 'success' else self._cw_metrics_response_time
+
+        # --- Build payload ---
+        payload: Dict[str, Union[str, int, float, dict, list]] = {
+            "_aws": {
+                # Shared by all the logs emitted for this request.
+                "Timestamp": time.time_ns() // 1_000_000,
+                "CloudWatchMetrics": cw_metrics
+            },
+            "Outcome": outcome,
+            "Retailer": self.scraper_name,
+            "ProxyId": proxy_id,
+            "ResponseTime": response_time_ms,
+            # Standard metadata.
+            "StatusCode": status,
+            "SanitizationRate": sanitization_rate,
+        }
+        if error_msg:
+            payload["Error"] = error_msg
+
+        # Add ProductCount field in payload only on success.
+        #   If we are emiting a single success logs (Scraper Variation 1 and 2), we want to count all the products in that single log.
+        #   If we are emiting multiple success logs (Scraper Variation 3), we want to count a single product per each success log.
+        if outcome == 'success':
+            payload["ProductCount"] = 1 if emit_multiple_logs else sanitized_product_count
+
+        # --- Emit the logs ---
+        # Skip serialization entirely when INFO records would be dropped anyway.
+        if not self.py_logger.isEnabledFor(logging.INFO):
+            return outcome
+        records = []
+        for i in range(number_of_logs_to_emit):
+            # Update url for each emitted log.
+            payload['Url'] = source_urls[i]
+            records.append(_dumps(payload))
+        # Emit all logs in a single write, each padded with a blank line above and below.
+        self._info('\n%s\n', '\n\n\n'.join(records))
+        self.last_emf_record = payload
+
+        return outcome
+
+
+
+    def log_processing_error(self, message: str, proxy_id: Optional[str] = None):
+        '''Use this function to log these 'processing_error' outcome, these are generic errors anywhere in the code'''
+        if not self.py_logger.isEnabledFor(logging.INFO):
+            return
+
+        # Create EMF payload.
+        payload = {
+            "_aws": {"Timestamp": time.time_ns() // 1_000_000, "CloudWatchMetrics": self._cw_metrics_request_count},
+            "Outcome": 'processing_error',
+            "Retailer": self.scraper_name,
+            "ProxyId": proxy_id if proxy_id else 'N/A',
+            "RequestCount": 1,
+            # Additional metadata.
+            "Error": message,
+        }
+
+        # Print the EMF log.
+        self._emit(payload)
+
+
+    def log_s3_upload(self, product_count, file_name, products_type, proxy_id: Optional[str] = None):
+        if not self.py_logger.isEnabledFor(logging.INFO):
+            return
+
+        # Create EMF payload.
+        payload = {
+            "_aws": {"Timestamp": time.time_ns() // 1_000_000, "CloudWatchMetrics": self._cw_metrics_product_count},
+            "Outcome": 's3_upload',
+            "Retailer": self.scraper_name,
+            "ProxyId": proxy_id if proxy_id else 'N/A',
+            "ProductCount": product_count,
+            # Additional metadata.
+            "ProductsType": products_type,  # Whether these products are seen or unseen.
+        }
+
+        # Print the EMF log.
+        self._emit(payload)
+
+        # Print info message for visual purpose.
+        self._info(_BANNER_FORMAT, f"{product_count} {products_type} products inserted into s3. Filename: {file_name}")
+
+
+    def log_products(self, products: list[dict], proxy_id: str):
+        """This function takes a list of sanitized products and loggs the essential details"""
+
+        if not isinstance(products, list):
+            raise ValueError(f"'products' must be of type 'list[dict]'. Got '{type(products)}' instead")
+        if not self.py_logger.isEnabledFor(logging.INFO):
+            return
+
+        # Create EMF payload.
+        payload = {
+            "_aws": {"Timestamp": time.time_ns() // 1_000_000, "CloudWatchMetrics": self._cw_metrics_product_count},
+            "Outcome": 'products',
+            "Retailer": self.scraper_name,
+            "ProxyId": proxy_id,
+            "ProductCount": len(products),
+        }
+
+        # Print the EMF log.
+        self._emit(payload)
+        
+        # Print product data for visual purpose. One line per product, written as a single log record.
+        if products:
+            self._info('\n'.join(
+                'product: ' + _dumps({
+                    'product_url': product['product_url'],
+                    'price': product.get('price', 'missing'),
+                    'in_stock': product.get('in_stock', 'missing'),
+                    'currency': product.get('currency', 'missing'),
+                })
+                for product in products
+            ))
+
+    
+    def log_info(self, message: str):
+        '''Prints any general purpose (informational) message'''
+        self._info('Info: %s', message)
+
+    
+    def log_stats(self, stats: dict):
+        """Simplified json print with some padding for visual separation."""
+        if self.py_logger.isEnabledFor(logging.INFO):
+            self._info(_BANNER_FORMAT, f'Stats: {_dumps(stats)}')
@@ -1,6 +1,4 @@
-import io
 import json
-import logging
 from pathlib import Path
 from centralized_utils.logger_v1 import LogController
 
@@ -117,39 +115,11 @@ def simulate_products(products):
 
 
 
-def get_log_as_string(func, *args, **kwargs):
-    # Create a string stream to capture logs
-    log_capture = io.StringIO()
+def get_emf_record(func, *args, **kwargs):
+    # Call the function (that logs something), and return the EMF payload it emitted.
+    func(*args, **kwargs)
+    return LOG_CONTROLLER.last_emf_record
 
-    # Create a logging handler that writes to the string stream
-    ch = logging.StreamHandler(log_capture)
-    ch.setLevel(logging.DEBUG)
-
-    # Get the root logger or any specific logger you expect the function to use
-    logger = logging.getLogger()
-    logger.addHandler(ch)
-
-    # Optionally, preserve and then change the log level
-    old_level = logger.level
-    logger.setLevel(logging.DEBUG)
-
-    try:
-        # Call the function (that logs something)
-        func(*args, **kwargs)
-    finally:
-        # Always remove our handler and reset the level after capturing
-        logger.removeHandler(ch)
-        logger.setLevel(old_level)
-
-    # Get the log output
-    captured_sting = log_capture.getvalue()
-
-    # Extract EMF log from captured string:
-    lines = captured_sting.split('\n')
-    for line in lines:
-        if '_aws' in line:
-            return line
-        
 
 
 def main():
@@ -192,28 +162,21 @@ def main():
     ]
 
     # Generate logs.
-    success_log = get_log_as_string(simulate_success)
-    proxy_issue_log = get_log_as_string(simulate_proxy_issue)
-    scraper_issue_log = get_log_as_string(simulate_scraper_issue)
-    processing_error_log = get_log_as_string(simulate_processing_error)
-    products_log = get_log_as_string(simulate_products, dummy_products[0:3])
-    s3_upload_log = get_log_as_string(simulate_s3_upload, dummy_products)
+    sample_logs = {
+        'success': get_emf_record(simulate_success),
+        'proxy_issue': get_emf_record(simulate_proxy_issue),
+        'scraper_issue': get_emf_record(simulate_scraper_issue),
+        'processing_error': get_emf_record(simulate_processing_error),
+        'products': get_emf_record(simulate_products, dummy_products[0:3]),
+        's3_upload': get_emf_record(simulate_s3_upload, dummy_products),
+    }
 
 
     # Write to json files with pretty indentation.
     samples_dir = Path(__file__).parent
-    with open(samples_dir / 'success.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(success_log), f, indent=4)
-    with open(samples_dir / 'proxy_issue.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(proxy_issue_log), f, indent=4)
-    with open(samples_dir / 'scraper_issue.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(scraper_issue_log), f, indent=4)
-    with open(samples_dir /'processing_error.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(processing_error_log), f, indent=4)
-    with open(samples_dir / 'products.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(products_log), f, indent=4)
-    with open(samples_dir / 's3_upload.json', 'w', encoding='utf-8') as f:
-        json.dump(json.loads(s3_upload_log), f, indent=4)
+    for name, log in sample_logs.items():
+        with open(samples_dir / f'{name}.json', 'w', encoding='utf-8') as f:
+            json.dump(log, f, indent=4)
 
 
     print('\n\nSample logs written to files.\n')
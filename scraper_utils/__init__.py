@@ -5,9 +5,32 @@ Provides reusable components for Logging, Redis, Postgres, S3, data processing,
 
 # Context Object
 from .context import GlobalScraperContext
-from .postgres_utils import initialize_postgres_client, load_scraper_configuration, check_if_restart_required, close_postgres_client
-from .redis_utils import initialize_redis_client, pop_source_urls_from_redis_temp, pop_sources_from_redis2, insert_failed_source_urls_into_redis_temp, insert_failed_sources_into_redis2, load_scraper_state, close_redis_client
-from .s3_utils import get_current_quarter_number, initialize_s3_client, upload_to_s3, close_s3_client
-from .proxy_utils import load_proxies
-from .data_processing_utils import sanitize_products
-from .logger_utils import initialize_logger
\ No newline at end of file
+
+import importlib
+
+# The utils below are imported on first access (PEP 562), so that importing the package does not pull in
+# asyncpg, redis, boto3, etc. until the functions that need them are used.
+_LAZY_IMPORTS = {
+    **dict.fromkeys(('initialize_postgres_client', 'load_scraper_configuration', 'check_if_restart_required', 'close_postgres_client'), 'postgres_utils'),
+    **dict.fromkeys(('initialize_redis_client', 'pop_source_urls_from_redis_temp', 'pop_sources_from_redis2', 'insert_failed_source_urls_into_redis_temp', 'insert_failed_sources_into_redis2', 'load_scraper_state', 'close_redis_client'), 'redis_utils'),
+    **dict.fromkeys(('get_current_quarter_number', 'initialize_s3_client', 'upload_to_s3', 'start_s3_upload_workers', 'queue_upload_to_s3', 'stop_s3_upload_workers', 'close_s3_client'), 's3_utils'),
+    'load_proxies': 'proxy_utils',
+    'sanitize_products': 'data_processing_utils',
+    'initialize_logger': 'logger_utils',
+}
+
+__all__ = ['GlobalScraperContext', *_LAZY_IMPORTS]
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value     # Cache, so later lookups don't go through __getattr__.
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
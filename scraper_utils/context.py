@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     import boto3
+    import asyncio
     import asyncpg
     from typing import List
     import redis.asyncio as aioredis
@@ -13,6 +14,16 @@ if TYPE_CHECKING:
 
 
 
+# Context variables that must be set before the scraper starts, checked in this order by confirm_all_mandatory_fields_are_initialized.
+_MANDATORY_FIELDS = (
+    'scraper_name', 'retailer_name', 'scraper_type', 'scraper_state', 'scraper_method_summary', 'running_environment',
+    'logger', 'redis_client', 'postgres_client', 's3_client', 'concurrency', 'redis_batch_size', 's3_bulk_size',
+    's3_bucket_name', 'redis_source_key_temp',
+)
+# Mandatory variables for which a falsy value (zero) is valid, so only None counts as missing.
+_ZERO_ALLOWED_FIELDS = frozenset({'concurrency'})
+
+
 class GlobalScraperContext():
     '''
     Holds global references for the scraper, including database connections, credentials, and other configurations.
@@ -25,7 +36,7 @@ class GlobalScraperContext():
         self.retailer_name:                  str                     = None
         self.scraper_state:                  str                     = None
         self.scraper_method_summary:         str                     = None
-        self.running_environment:            str                     = os.getenv('RUNNING_ENVIRONMENT').lower()
+        self.running_environment:            str                     = (os.getenv('RUNNING_ENVIRONMENT') or '').lower() or None    # Reported by confirm_all_mandatory_fields_are_initialized if missing.
         self.proxy_ids:                      List[str]               = None
         self.proxies_list:                   List[Proxy]             = None
         self.concurrency:                    int                     = None
@@ -50,10 +61,14 @@ class GlobalScraperContext():
         self.redis_client:                   aioredis.Redis          = None
         self.postgres_client:                asyncpg.Connection      = None
         self.s3_client:                      boto3.client            = None
+        self.s3_upload_queue:                asyncio.Queue           = None    # Set by start_s3_upload_workers (optional).
+        self.s3_upload_workers:              List[asyncio.Task]      = None
 
         # Misc
         self.scraper_start_time:             datetime                = datetime.now(timezone.utc)
         self.redis_sha_for_popping                                   = None
+        self.redis_sha_for_reinserting                               = None
+        self.redis_sha_for_marking_seen                              = None
         self.exit_code:                      int                     = 0
         
         # Credentials
@@ -84,33 +99,7 @@ class GlobalScraperContext():
 
     def confirm_all_mandatory_fields_are_initialized(self):
         '''Raises an exception if any of the mandatory global context variables are not initialized.'''
-        if not self.scraper_name:
-            raise Exception(f"Missing mandatory context variable: 'scraper_name'")
-        if not self.retailer_name:
-            raise Exception(f"Missing mandatory context variable: 'retailer_name'")
-        if not self.scraper_type:
-            raise Exception(f"Missing mandatory context variable: 'scraper_type'")
-        if not self.scraper_state:
-            raise Exception(f"Missing mandatory context variable: 'scraper_state'")
-        if not self.scraper_method_summary:
-            raise Exception(f"Missing mandatory context variable: 'scraper_method_summary'")
-        if not self.running_environment:
-            raise Exception(f"Missing mandatory context variable: 'running_environment'")
-        if not self.logger:
-            raise Exception(f"Missing mandatory context variable: 'logger'")
-        if not self.redis_client:
-            raise Exception(f"Missing mandatory context variable: 'redis_client'")
-        if not self.postgres_client:
-            raise Exception(f"Missing mandatory context variable: 'postgres_client'")
-        if not self.s3_client:
-            raise Exception(f"Missing mandatory context variable: 's3_client'")
-        if self.concurrency == None:    # Accept zero conurrency.
-            raise Exception(f"Missing mandatory context variable: 'concurrency'")
-        if not self.redis_batch_size:
-            raise Exception(f"Missing mandatory context variable: 'redis_batch_size'")
-        if not self.s3_bulk_size:
-            raise Exception(f"Missing mandatory context variable: 's3_bulk_size'")
-        if not self.s3_bucket_name:
-            raise Exception(f"Missing mandatory context variable: 's3_bucket_name'")
-        if not self.redis_source_key_temp:
-            raise Exception(f"Missing mandatory context variable: 'redis_source_key_temp'")
\ No newline at end of file
+        for field in _MANDATORY_FIELDS:
+            value = getattr(self, field)
+            if value is None or (not value and field not in _ZERO_ALLOWED_FIELDS):
+                raise Exception(f"Missing mandatory context variable: '{field}'")
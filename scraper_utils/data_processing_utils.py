@@ -1,8 +1,68 @@
 import re
-from datetime import datetime
+from datetime import date, datetime
 from .context import GlobalScraperContext
 
 
+# Product schemas, updating schema should be not done unless mudassir authorizes it.
+# Built once at import instead of for every product.
+_PS_SCHEMA = {
+    "product_url": {"type": str, "required":True},
+    "retailer": {"type": str, "required":True},
+    "retailers_brand": {"type": str, "required":False},
+    "retailers_mpn": {"type": str, "required":False},
+    "sku": {"type": str, "required":False},
+    "price": {"type": float, "required":True},
+    "in_stock": {"type": bool, "required":True},
+    "currency": {"type": str, "required":True},
+    "scraperid": {"type": str, "required":True},
+    "date_download": {"type": str, "required":True},
+    "scrape_method": {"type": str, "required":True},
+}
+
+_META_SCHEMA = {
+    "product_url": {"type": str, "required":True},
+    "retailer": {"type": str, "required":True},
+    "retailers_brand": {"type": str, "required":True},
+    "retailers_mpn": {"type": str, "required":True},
+    "title": {"type": str, "required":True},
+    "sku": {"type": str, "required":False},
+    "avg_rating": {"type": float, "required":False},
+    "number_of_reviews": {"type": int, "required":False},
+    "price": {"type": float, "required":False},
+    "in_stock": {"type": bool, "required":False},
+    "images": {"type": list, "required":False},
+    "description": {"type": str, "required":False},
+    "currency": {"type": str, "required":False},
+    "retailers_upc": {"type": list, "required":False},
+    "scraperid": {"type": str, "required":True},
+    "date_download": {"type": str, "required":True},
+    "scrape_method": {"type": str, "required":True},
+}
+
+
+def _schema_fields(schema: dict) -> tuple:
+    '''Flatten a schema into (field, type, required) tuples, in schema order.'''
+    return tuple((field, rules["type"], rules["required"]) for field, rules in schema.items())
+
+_PS_FIELDS = _schema_fields(_PS_SCHEMA)
+_META_FIELDS = _schema_fields(_META_SCHEMA)
+
+# Strings that count as a missing value.
+_MISSING_STRINGS = frozenset(("", "null", "undefined"))
+
+# Regex pattern for html tags. Matches the same tags as '<.*?>' (up to the first '>' on the same line), but with a
+# negated character class instead of a lazy quantifier, which doesn't retry '>' after every character.
+_HTML_TAG_RE = re.compile('<[^>\n]*>')
+
+# Length of the description prefix whose whitespace is normalized before truncating to 2000 characters.
+_DESCRIPTION_PREFIX_LENGTH = 4000
+
+# Canonical 'scraperid' and 'date_download' formats. Values in exactly these forms are validated with fromisoformat(),
+# which is much faster than strptime(); anything else still goes through strptime(), so the accepted values don't change.
+_SCRAPERID_RE = re.compile(r'\d{4}-\d{2}-\d{2}', re.ASCII)
+_DATE_DOWNLOAD_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', re.ASCII)
+
+
 def sanitize_products(context: GlobalScraperContext, products: list[dict]):
     # Determine which implementation of the sanitization function to call, based on scraper type.
     if context.scraper_type == 'ps':
@@ -15,91 +75,35 @@ def sanitize_products(context: GlobalScraperContext, products: list[dict]):
 
 # Function to sanitize product data, updating schema should be not done unless mudassir authorizes it.
 def sanitize_products_ps(context: GlobalScraperContext, products: list[dict]):
-    sanitized_products = []
+    return _sanitize_products(context, products, _PS_FIELDS, _ps_skip_missing_required_field)
 
-    if not isinstance(products, list):
-        raise ValueError(f"'dirty_products' must be of type 'list[dict]'. Got '{type(products)}' instead")
-    
-    for p in products:
-        try:
-            schema = {
-                "product_url": {"type": str, "required":True},
-                "retailer": {"type": str, "required":True},     
-                "retailers_brand": {"type": str, "required":False},
-                "retailers_mpn": {"type": str, "required":False},
-                "sku": {"type": str, "required":False},
-                "price": {"type": float, "required":True}, 
-                "in_stock": {"type": bool, "required":True},
-                "currency": {"type": str, "required":True},
-                "scraperid": {"type": str, "required":True},
-                "date_download": {"type": str, "required":True},
-                "scrape_method": {"type": str, "required":True},
-            }
-            # Create sanitized dict to store processed values
-            sanitized = {}
-            # for each key/value in provided data validate its type, confirm its existence if required = True, and in the end format the fields as needed
-            for field, rules in schema.items():
-                value = p.get(field)
-                require = rules.get("required")
-                type_ = rules.get("type")
-                # Check if required field exists
-                if require == True and value in (None, "", "null", "undefined"):
-                    # Edge case # 1 for price, if retailer is amazone and price is None, dont pass key/value any further
-                    if field == 'price' and p['retailer'] == 'Amazon':
-                        continue
-                    # Edge case # 2 for price, if in_stock is false and price is None, dont pass key/value any further
-                    elif field == 'price' and p['in_stock'] == False:
-                        continue
-                    # Edge case # 3. Currency can be None, if price is None, don't pass key/value any further.
-                    elif field == 'currency' and p['price'] in (None, "", "null", "undefined"):
-                        continue
-                    # For anything else if required Field value is None, raise valueError
-                    else:
-                        raise ValueError(f"Required field '{field}' is missing.")
-                # if value is None and required=False, dont add key/value to sanitize
-                if require == False and value in (None, "", "null", "undefined"):
-                    continue
-                # Check if value matches the schema types
-                if value is not None and not isinstance(value, type_):
-                    raise ValueError(f"Field '{field}' must be of type {type_.__name__}")
-                # Apply field-specific formatting
-                if value is not None:
-                    # Handle float truncation
-                    if field == "price" and isinstance(value, float):
-                        value = float(f"{value:.2f}")
-                    elif field == "avg_rating" and isinstance(value, float):
-                        value = float(f"{value:.1f}")
-                    # Handle date formats
-                    elif field == "scraperid":
-                        try:
-                            datetime.strptime(value, "%Y-%m-%d")
-                        except ValueError:
-                            raise ValueError(f"Field 'scraperid' must match format YYYY-MM-DD")
-                    elif field == "date_download":
-                        try:
-                            datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
-                        except ValueError:
-                            raise ValueError(f"Field 'date_download' must match format YYYY-MM-DDTHH:MM:SS")
-                    # Handle currency
-                    elif field == "currency" and isinstance(value, str):
-                        value = value.upper()
-                        if value != "USD":
-                            raise ValueError(f"Field 'Currency' must be USD")
-                sanitized[field] = value
-            sanitized_products.append(sanitized)
-        except Exception as e:
-            context.logger.log_info(f'Failed to sanitize product - {str(e)} Product: {p}')
-            continue  # Continue with the next product.
-    
-    sanitization_rate = (len(sanitized_products) / len(products) * 100) if products else 0
 
-    return sanitized_products, sanitization_rate
+# Function to sanitize product data, updating schema should be not done unless mudassir authorizes it.
+def sanitize_products_meta(context: GlobalScraperContext, products: list[dict]):
+    return _sanitize_products(context, products, _META_FIELDS, None)
 
 
+def _ps_skip_missing_required_field(field: str, p: dict) -> bool:
+    '''Edge cases where a required field of a 'ps' product may be missing. The field is then left out of the sanitized product.'''
+    # Edge case # 1 for price, if retailer is amazone and price is None, dont pass key/value any further
+    if field == 'price' and p['retailer'] == 'Amazon':
+        return True
+    # Edge case # 2 for price, if in_stock is false and price is None, dont pass key/value any further
+    elif field == 'price' and p['in_stock'] == False:
+        return True
+    # Edge case # 3. Currency can be None, if price is None, don't pass key/value any further.
+    elif field == 'currency':
+        price = p['price']
+        return price is None or (isinstance(price, str) and price in _MISSING_STRINGS)
+    return False
 
 
-# Function to sanitize product data, updating schema should be not done unless mudassir authorizes it.
-def sanitize_products_meta(context: GlobalScraperContext, products: list[dict]):
+def _sanitize_products(context: GlobalScraperContext, products: list[dict], schema_fields: tuple, skip_missing_required_field):
+    '''
+    Sanitize products against schema_fields (see _schema_fields). Returns the sanitized products and the sanitization rate.
+    skip_missing_required_field(field, product), if given, decides whether a missing required field is allowed (and left out),
+    otherwise a missing required field fails the product.
+    '''
     sanitized_products = []
 
     if not isinstance(products, list):
@@ -107,39 +111,21 @@ def sanitize_products_meta(context: GlobalScraperContext, products: list[dict]):
     
     for p in products:
         try:
-            schema = {
-                "product_url": {"type": str, "required":True},
-                "retailer": {"type": str, "required":True},     
-                "retailers_brand": {"type": str, "required":True},
-                "retailers_mpn": {"type": str, "required":True},
-                "title": {"type": str, "required":True},
-                "sku": {"type": str, "required":False},
-                "avg_rating": {"type": float, "required":False},
-                "number_of_reviews": {"type": int, "required":False},
-                "price": {"type": float, "required":False}, 
-                "in_stock": {"type": bool, "required":False},
-                "images": {"type": list, "required":False},
-                "description": {"type": str, "required":False},
-                "currency": {"type": str, "required":False},
-                "retailers_upc": {"type": list, "required":False},
-                "scraperid": {"type": str, "required":True},
-                "date_download": {"type": str, "required":True},
-                "scrape_method": {"type": str, "required":True},
-            }
-            # regex patter for html tags
-            cleanr = re.compile('<.*?>')
             # Create sanitized dict to store processed values
             sanitized = {}
             # for each key/value in provided data validate its type, confirm its existence if required = True, and in the end format the fields as needed
-            for field, rules in schema.items():
+            for field, type_, require in schema_fields:
                 value = p.get(field)
-                require = rules.get("required")
-                type_ = rules.get("type")
+                # Values that count as missing (lists, e.g. 'images', are never missing).
+                missing = value is None or (isinstance(value, str) and value in _MISSING_STRINGS)
                 # Check if required field exists
-                if require == True and value in (None, "", "null", "undefined"):
+                if require == True and missing:
+                    if skip_missing_required_field is not None and skip_missing_required_field(field, p):
+                        continue
+                    # For anything else if required Field value is None, raise valueError
                     raise ValueError(f"Required field '{field}' is missing.")
                 # if value is None and required=False, dont add key/value to sanitize
-                if require == False and value in (None, "", "null", "undefined"):
+                if require == False and missing:
                     continue
                 # Check if value matches the schema types
                 if value is not None and not isinstance(value, type_):
@@ -148,23 +134,34 @@ def sanitize_products_meta(context: GlobalScraperContext, products: list[dict]):
                 if value is not None:
                     # Handle description
                     if field == "description" and isinstance(value, str):
-                        value = re.sub(cleanr, '', value)
+                        value = _HTML_TAG_RE.sub('', value)
                         if len(value) > 2000:
-                            value = ' '.join(value.split())[:2000]
-                    # Handle float truncation
+                            # Normalize whitespace on a bounded prefix first: its result is always a prefix of the full result,
+                            # so when it is long enough the rest of a long description never has to be split.
+                            normalized = ' '.join(value[:_DESCRIPTION_PREFIX_LENGTH].split())
+                            if len(normalized) < 2000:
+                                normalized = ' '.join(value.split())
+                            value = normalized[:2000]
+                    # Handle float rounding (round() gives the same result as float(f"{value:.2f}"), without the string round-trip)
                     elif field == "price" and isinstance(value, float):
-                        value = float(f"{value:.2f}")
+                        value = round(value, 2)
                     elif field == "avg_rating" and isinstance(value, float):
-                        value = float(f"{value:.1f}")
+                        value = round(value, 1)
                     # Handle date formats
                     elif field == "scraperid":
                         try:
-                            datetime.strptime(value, "%Y-%m-%d")
+                            if _SCRAPERID_RE.fullmatch(value):
+                                date.fromisoformat(value)
+                            else:
+                                datetime.strptime(value, "%Y-%m-%d")    # Other forms strptime accepts, e.g. '2024-1-2'.
                         except ValueError:
                             raise ValueError(f"Field 'scraperid' must match format YYYY-MM-DD")
                     elif field == "date_download":
                         try:
-                            datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+                            if _DATE_DOWNLOAD_RE.fullmatch(value):
+                                datetime.fromisoformat(value)
+                            else:
+                                datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")    # Other forms strptime accepts, e.g. '2024-1-2T3:04:05'.
                         except ValueError:
                             raise ValueError(f"Field 'date_download' must match format YYYY-MM-DDTHH:MM:SS")
                     # Handle images (remove duplicates)
@@ -184,5 +181,3 @@ def sanitize_products_meta(context: GlobalScraperContext, products: list[dict]):
     sanitization_rate = (len(sanitized_products) / len(products) * 100) if products else 0
 
     return sanitized_products, sanitization_rate
-
-
@@ -52,26 +52,25 @@ async def close_postgres_client(context: GlobalScraperContext):
 
 async def load_scraper_configuration(context: GlobalScraperContext):
     try:
-        # Read scraper configuration from postgres and update container_state in a single transaction.
+        # Read scraper configuration from postgres.
         pool = context.postgres_client
         async with pool.acquire() as conn:
-            async with conn.transaction():
-                
-                # First look for scraper in schema "scrapers".
-                query = "SELECT * FROM scrapers.scrapers_configuration WHERE scraper_name = $1;"
+
+            # First look for scraper in schema "scrapers", setting its container_state to 1 and reading its config in one statement.
+            query = "UPDATE scrapers.scrapers_configuration SET container_state = $1 WHERE scraper_name = $2 RETURNING *;"
+            row = await conn.fetchrow(query, 1, context.scraper_name)
+
+            # If not found, check in schema "scrapers_meta".
+            if not row:
+                context.logger.log_info('Scraper config not found in postgres schema "scrapers". Checking in postgres schema "scrapers_meta"')
+                query = "SELECT * FROM scrapers_meta.scrapers_configuration_meta WHERE scraper_name = $1;" 
                 row = await conn.fetchrow(query, context.scraper_name)
-                
-                # If not found, check in schema "scrapers_meta".
-                if not row:
-                    context.logger.log_info('Scraper config not found in postgres schema "scrapers". Checking in postgres schema "scrapers_meta"')
-                    query = "SELECT * FROM scrapers_meta.scrapers_configuration_meta WHERE scraper_name = $1;" 
-                    row = await conn.fetchrow(query, context.scraper_name)
-
-                psql_scraper_config = dict(row)
-
-                # Set container_state to 1.
-                query = "UPDATE scrapers.scrapers_configuration SET container_state = $1 WHERE scraper_name = $2;"
-                await conn.execute(query, 1, context.scraper_name)
+
+            if row is None:
+                raise ValueError(f"Scraper '{context.scraper_name}' not found in postgres schemas \"scrapers\" and \"scrapers_meta\"")
+
+            # asyncpg Records support lookups by column name, no need to copy into a dict.
+            psql_scraper_config = row
          
         context.scraper_state_key = psql_scraper_config['scraper_state_key']
         context.concurrency = psql_scraper_config['concurrency']
@@ -120,13 +119,16 @@ async def check_if_restart_required(context: GlobalScraperContext) -> bool:
             query = "SELECT container_state FROM scrapers.scrapers_configuration WHERE scraper_name = $1;"
             row = await conn.fetchrow(query, context.scraper_name)
             
-            # If not found, check in schema "scrapers_meta".
-            if not row:
+            # If not found, check in schema "scrapers_meta". (Existence is checked on the row, as container_state itself may be NULL.)
+            if row is None:
                 context.logger.log_info('Container state not found in postgres schema "scrapers". Checking in postgres schema "scrapers_meta"')
                 query = "SELECT container_state FROM scrapers_meta.scrapers_configuration_meta WHERE scraper_name = $1;"
                 row = await conn.fetchrow(query, context.scraper_name)
             
-            container_state = row[0]
+            if row is None:
+                raise ValueError(f"Container state of '{context.scraper_name}' not found")
+
+            container_state = row['container_state']
 
             context.logger.log_info(f'Container State: {container_state}')
             
@@ -1,35 +1,42 @@
+import re
 from .context import GlobalScraperContext
 
 
 
+# Proxy url: scheme://[username:password@]ip:port
+# The username ends at the first ':', and the password runs up to the last '@', so passwords may contain ':', '@' and '/'.
+_PROXY_URL_RE = re.compile(r'[^:/]+://(?:([^:]*):(.*)@)?([^:@/]+):(\d+)/?')
+
+
 # Function to load proxies from Redis
 class Proxy():
     def __init__(self, proxy_id, url: str):
         self.proxy_id = proxy_id
         self.http_url = url
-        if '@' in url:  # Username/password authentication. 
-            proxy_string = url.split('//')[1] 
-            self.ip = proxy_string.split('@')[1].split(':')[0]
-            self.port = proxy_string.split('@')[1].split(':')[1]
-            self.username = proxy_string.split('@')[0].split(':')[0]
-            self.password = proxy_string.split('@')[0].split(':')[1]
-        else:         # No authentication (whitelisted)
-            proxy_string = url.split('//')[1]
-            self.ip = proxy_string.split(':')[0]
-            self.port = proxy_string.split(':')[1]
-            self.username = None
-            self.password = None
+        # Username/password are None for proxies without authentication (whitelisted).
+        match = _PROXY_URL_RE.fullmatch(url)
+        if match is None:
+            raise ValueError(f'Invalid proxy url: {url}')
+        self.username, self.password, self.ip, self.port = match.groups()
 
 
 async def load_proxies(context: GlobalScraperContext):
     try:
         proxies = []
-        for proxy_id in context.proxy_ids:
-            ip_list = await context.redis_client.smembers(proxy_id)
-            ip_list = [p.decode() for p in ip_list]
+        # Fetch the IPs of all proxy ids in a single round-trip.
+        async with context.redis_client.pipeline(transaction=False) as pipe:
+            for proxy_id in context.proxy_ids:
+                pipe.smembers(proxy_id)
+            results = await pipe.execute()
+        for proxy_id, ip_list in zip(context.proxy_ids, results):
             for ip in ip_list:
-                proxy_url = 'http://' + ip
-                proxy = Proxy(proxy_id, proxy_url)
+                proxy_url = 'http://' + ip.decode().strip()
+                # Skip invalid entries, so that one bad member does not prevent the rest from loading.
+                try:
+                    proxy = Proxy(proxy_id, proxy_url)
+                except ValueError as e:
+                    context.logger.log_processing_error(f'Skipping proxy: {e}', proxy_id=proxy_id)
+                    continue
                 proxies.append(proxy)
         
         context.proxies_list = proxies
@@ -45,7 +45,7 @@ async def close_redis_client(context: GlobalScraperContext):
 async def pop_source_urls_from_redis_temp(context: GlobalScraperContext) -> list[str]:
     urls = await context.redis_client.spop(context.redis_source_key_temp, context.redis_batch_size)
     context.logger.log_info(f'Popped {len(urls)} from redis.')
-    return [url.decode('utf-8') for url in urls] if urls else []
+    return list(map(bytes.decode, urls)) if urls else []
 
 
 # Set variant
@@ -95,10 +95,9 @@ async def pop_sources_from_redis2(context: GlobalScraperContext) -> list[dict]:
     if not flat_raw_list:  # No urls in redis.
         return []
 
-    sources = [
-        {"src": flat_raw_list[i].decode(), "retries": int(flat_raw_list[i + 1].decode())}
-        for i in range(0, len(flat_raw_list), 2)
-    ]
+    # Pair up the flat [src, retries, src, retries, ...] reply (int() parses the retries bytes directly).
+    pairs = iter(flat_raw_list)
+    sources = [{"src": src.decode(), "retries": int(retries)} for src, retries in zip(pairs, pairs)]
 
     context.logger.log_info(
         f'Popped {len(sources)} urls from redis hash "{context.redis_source_key_temp}".'
@@ -122,22 +121,39 @@ async def insert_failed_sources_into_redis2(context: GlobalScraperContext, sourc
                 {"src": "r.com/p3", "retries": 2}
             ]
     """
+    # Use Lua script, to reinsert/fail all sources in a single call, with the retry decision made on the redis side.
+    LUA_SCRIPT_FOR_REINSERTING = """
+    local temp_key = KEYS[1]
+    local failed_key = KEYS[2]
+    local max_retries = tonumber(ARGV[1])
+    for i = 2, #ARGV, 2 do
+        local new_retry_count = tonumber(ARGV[i + 1]) + 1
+        if new_retry_count <= max_retries then
+            -- Still eligible for retry, reinsert with incremented count.
+            redis.call('HSET', temp_key, ARGV[i], new_retry_count)
+        else
+            -- Retries exhausted, increment fail counter.
+            redis.call('HINCRBY', failed_key, ARGV[i], 1)
+        end
+    end
+    return 0
+    """
+
     try:
-        async with context.redis_client.pipeline(transaction=False) as pipe:
-            for source in sources:
-                src = source["src"]
-                old_retry_count = int(source["retries"])
-                new_retry_count = old_retry_count + 1
-
-                if new_retry_count <= context.max_retries_same_cycle:
-                    # Still eligible for retry — reinsert with incremented count
-                    pipe.hset(context.redis_temp_key, src, new_retry_count)
-                else:
-                    # Retries exhausted — increment fail counter
-                    pipe.hincrby(context.redis_failed_key, src, 1)
-
-            # Execute all queued commands in one batch
-            await pipe.execute()
+        # Create a reusable sha for reinserting lua script.
+        if not context.redis_sha_for_reinserting:
+            context.redis_sha_for_reinserting = await context.redis_client.script_load(LUA_SCRIPT_FOR_REINSERTING)
+
+        # Flat list of src, retries pairs.
+        args = []
+        for source in sources:
+            args.append(source["src"])
+            args.append(int(source["retries"]))
+
+        await context.redis_client.evalsha(
+            context.redis_sha_for_reinserting, 2, context.redis_temp_key, context.redis_failed_key,
+            context.max_retries_same_cycle, *args
+        )
 
         context.logger.log_info(
             message=f"Inserted {len(sources)} failed urls to Redis."
@@ -1,13 +1,29 @@
+import io
 import os
-import json
 import uuid
+import random
 import boto3
 import asyncio
-import hashlib
+from typing import Optional
 from datetime import datetime, timezone
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from centralized_utils.json_utils import dumps as _dumps
 from .context import GlobalScraperContext
 
 
+# Files up to this size are uploaded with a single PutObject request. Larger ones are uploaded as multipart, with parts sent in parallel.
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, max_concurrency=10, use_threads=True)
+
+# Size of the s3 client's connection pool. Uploads run in worker threads (several at once, each multipart upload with
+# up to 10 parts in flight), so the default pool of 10 connections would make them queue for a connection.
+S3_CLIENT_CONFIG = Config(max_pool_connections=64)
+
+# Rounds of upload attempts an s3 upload worker makes for a queued buffer before dropping it (see start_s3_upload_workers).
+MAX_UPLOAD_ROUNDS = 2
+
+
 
 def get_current_quarter_number(now):
     """
@@ -17,18 +33,19 @@ def get_current_quarter_number(now):
     Quarter 3: 12:00 - 17:59 UTC
     Quarter 4: 18:00 - 23:59 UTC
     """
-    hour = now.hour
-    if 0 <= hour < 6:
-        return '1'
-    elif 6 <= hour < 12:
-        return '2'
-    elif 12 <= hour < 18:
-        return '3'
-    else:
-        return '4'
+    return str(now.hour // 6 + 1)
     
 
 
+def get_retry_delay(attempt: int) -> float:
+    """
+    Seconds to wait after a failed upload attempt (1, 2, ...): exponential backoff with random jitter, capped at 30 seconds.
+    The jitter keeps scrapers that failed at the same time (e.g. during s3 throttling) from all retrying at the same moment.
+    """
+    return min(2 ** attempt + random.uniform(0, 1), 30)
+
+
+
 async def split_unseen_seen_products(context: GlobalScraperContext, product_buffer: list):
     """
     Evaluate whether products have metadata by attempting to add them to Redis set 'retailer_seen_urls'.
@@ -36,15 +53,23 @@ async def split_unseen_seen_products(context: GlobalScraperContext, product_buff
     If URL is newly inserted, append product to unseen_products list.
     """
     
-    # Add tasks to redis pipeline.
-    pipeline = context.redis_client.pipeline()
-    for product in product_buffer:
-        # Extract url from each product, and create task for adding the url to redis.
-        url = product['product_url']
-        pipeline.sadd(context.redis_seen_products_key, url)
+    # Use Lua script, to add all urls in a single call, returning the SADD result (1 if newly inserted, 0 if it already existed) of each url.
+    LUA_SCRIPT_FOR_MARKING_SEEN = """
+    local key = KEYS[1]
+    local results = {}
+    for i = 1, #ARGV do
+        results[i] = redis.call('SADD', key, ARGV[i])
+    end
+    return results
+    """
 
-    # Execute the pipeline in one batch.
-    results = await pipeline.execute()  
+    # Create a reusable sha for marking seen lua script.
+    if not context.redis_sha_for_marking_seen:
+        context.redis_sha_for_marking_seen = await context.redis_client.script_load(LUA_SCRIPT_FOR_MARKING_SEEN)
+
+    # Extract url from each product, and add all urls to redis in one batch.
+    urls = [product['product_url'] for product in product_buffer]
+    results = await context.redis_client.evalsha(context.redis_sha_for_marking_seen, 1, context.redis_seen_products_key, *urls)
 
     # Categorize Products based on the Redis response.
     unseen_products = []
@@ -68,7 +93,8 @@ def initialize_s3_client(context: GlobalScraperContext):
             s3_client = boto3.client(
                 's3',
                 aws_access_key_id=context.aws_access_key_id_prod,
-                aws_secret_access_key=context.aws_secret_access_key_prod
+                aws_secret_access_key=context.aws_secret_access_key_prod,
+                config=S3_CLIENT_CONFIG
             )
 
         elif context.running_environment == 'dev':   # Iniitialize s3 for dev.
@@ -77,7 +103,8 @@ def initialize_s3_client(context: GlobalScraperContext):
             s3_client = boto3.client(
                 's3',
                 aws_access_key_id=context.aws_access_key_id_dev,
-                aws_secret_access_key=context.aws_secret_access_key_dev
+                aws_secret_access_key=context.aws_secret_access_key_dev,
+                config=S3_CLIENT_CONFIG
             )
         
         context.s3_client = s3_client
@@ -94,6 +121,27 @@ def close_s3_client(context: GlobalScraperContext):
 
 
 
+def put_file_to_s3(context: GlobalScraperContext, file_name: str, body: bytes):
+    """
+    Upload 'body' to the scraper's s3 bucket, using multipart upload for files above MULTIPART_THRESHOLD.
+    This is a blocking boto3 call, so coroutines run it with asyncio.to_thread to keep the event loop free during the upload.
+    """
+    if len(body) <= MULTIPART_THRESHOLD:
+        context.s3_client.put_object(Bucket=context.s3_bucket_name, Key=file_name, Body=body)
+    else:
+        context.s3_client.upload_fileobj(io.BytesIO(body), context.s3_bucket_name, file_name, Config=TRANSFER_CONFIG)
+
+
+
+def encode_jsonl(products: list) -> bytes:
+    """
+    Serialize products to JSONL, one product per line. json_utils.dumps returns compact UTF-8 bytes directly
+    (with orjson when installed), so the content is built in a single pass, without an intermediate str of the whole file.
+    """
+    return b"\n".join(map(_dumps, products))
+
+
+
 async def upload_to_s3(context: GlobalScraperContext, product_buffer): 
     # Determine which implementation of the upload_to_s3 function to call, based on scraper type.
     if context.scraper_type == 'ps':
@@ -103,27 +151,28 @@ async def upload_to_s3(context: GlobalScraperContext, product_buffer):
 
 
 
-async def upload_to_s3_ps(context: GlobalScraperContext, product_buffer): 
+async def upload_to_s3_ps(context: GlobalScraperContext, product_buffer, split_products: Optional[tuple] = None, from_upload_worker: bool = False): 
     """
     Uploads a list of sanitized product dictionaries to S3 in JSONL format.
     For seen products (having metadata), the file is stored to "daily_pricing" folder.
     For unseen products (missing metadata), the file is stored to "datasets/retailer_daily_unseen" folder.
     After successfully saving to s3, product_buffer is cleared.
     On exceeding max_attempts, scraper is paused for a few minutes to save proxy wastage.
+    split_products: optional (unseen_products, seen_products) of product_buffer from an earlier split_unseen_seen_products call.
+    Pass it when retrying a failed upload: the split adds the urls to the seen set, so splitting again would make every product seen.
+    from_upload_worker: set by the s3 upload workers, which do their own pausing; the upload returns right after the last failed attempt.
     """
     if not product_buffer:
         return  # Avoid uploading an empty list
 
     # Split products in two lists, seen products (having metadata) and unseen_products (missing metadata).
-    unseen_products, seen_products = await split_unseen_seen_products(context, product_buffer)
+    if split_products is None:
+        split_products = await split_unseen_seen_products(context, product_buffer)
+    unseen_products, seen_products = split_products
 
     # Convert products to JSONL format
-    jsonl_content_seen = "\n".join(json.dumps(product) for product in seen_products)
-    jsonl_content_unseen = "\n".join(json.dumps(product) for product in unseen_products)
-    
-    # Generate content hashes for the filename
-    content_hash_seen = hashlib.md5(jsonl_content_seen.encode('utf-8')).hexdigest()
-    content_hash_unseen = hashlib.md5(jsonl_content_unseen.encode('utf-8')).hexdigest()
+    jsonl_content_seen = encode_jsonl(seen_products)
+    jsonl_content_unseen = encode_jsonl(unseen_products)
     
     # Get current UTC time
     now = datetime.now(timezone.utc)
@@ -134,24 +183,33 @@ async def upload_to_s3_ps(context: GlobalScraperContext, product_buffer):
     # Determine the current quarter number
     quarter = get_current_quarter_number(now)
     
-    # Construct the S3 file paths
-    file_name_seen = f"daily_pricing/{date_str}-{quarter}/{content_hash_seen}-{uuid.uuid4()}.jsonl"      # For products that have metadata.
-    file_name_unseen = f"datasets/{context.retailer_name.lower()}_daily_unseen/{date_str}-{quarter}/{content_hash_unseen}-{uuid.uuid4()}.jsonl"    # For products with missing metadata.
+    # Construct the S3 file paths (the uuid makes each file name unique)
+    file_name_seen = f"daily_pricing/{date_str}-{quarter}/{uuid.uuid4()}.jsonl"      # For products that have metadata.
+    file_name_unseen = f"datasets/{context.retailer_name.lower()}_daily_unseen/{date_str}-{quarter}/{uuid.uuid4()}.jsonl"    # For products with missing metadata.
     
     # Attempt to upload with retries
     max_attempts = 3
     for current_attempt in range(1, max_attempts+1):     # Hint: 1, 2, 3
         try:
             
+            # Files to upload: seen product data to s3 "daily_pricing" folder, unseen product data to s3 "datasets/reatailer_daily_unseen" folder.
+            uploads = []
             if seen_products:
-                # Upload seen product data to s3 "daily_pricing" folder.
-                context.s3_client.put_object(Bucket=context.s3_bucket_name, Key=file_name_seen, Body=jsonl_content_seen)
-                context.logger.log_s3_upload(len(seen_products), file_name_seen, 'seen', context.proxy_ids[0])
-            
+                uploads.append((len(seen_products), file_name_seen, jsonl_content_seen, 'seen'))
             if unseen_products:
-                # Upload unseen product data to s3 "datasets/reatailer_daily_unseen" folder.
-                context.s3_client.put_object(Bucket=context.s3_bucket_name, Key=file_name_unseen, Body=jsonl_content_unseen)
-                context.logger.log_s3_upload(len(unseen_products), file_name_unseen, 'unseen', context.proxy_ids[0])
+                uploads.append((len(unseen_products), file_name_unseen, jsonl_content_unseen, 'unseen'))
+
+            # Upload both files concurrently, then log each successful upload. If any upload failed, raise its error to retry.
+            results = await asyncio.gather(
+                *(asyncio.to_thread(put_file_to_s3, context, file_name, body) for _, file_name, body, _ in uploads),
+                return_exceptions=True,
+            )
+            for (product_count, file_name, _, file_type), result in zip(uploads, results):
+                if not isinstance(result, Exception):
+                    context.logger.log_s3_upload(product_count, file_name, file_type, context.proxy_ids[0])
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
             
             # After data is successfully uploaded to s3, clear product buffer. And break out of retry loop.
             product_buffer.clear()
@@ -160,29 +218,27 @@ async def upload_to_s3_ps(context: GlobalScraperContext, product_buffer):
             context.logger.log_processing_error(message=f'S3 upload attempt {current_attempt} failed: {e}', proxy_id=context.proxy_ids[0])
             if current_attempt != max_attempts:
                 # Wait, then retry.
-                await asyncio.sleep(3) 
-            else:
+                await asyncio.sleep(get_retry_delay(current_attempt))
+            elif not from_upload_worker:
                 # If there is an error on uploading to s3 after max_attempts, pause thread for 10 minutes, to save proxy wastage, then return.
                 context.logger.log_processing_error(message=f"Failed to upload to s3 after {max_attempts} attempts.\nPausing worker for 10 minutes to save proxy wastage.", proxy_id=context.proxy_ids[0])
-                await asyncio.sleep(10*60)      
+                await asyncio.sleep(10*60 + random.uniform(0, 60))
 
 
 
-async def upload_to_s3_meta(context: GlobalScraperContext, product_buffer): 
+async def upload_to_s3_meta(context: GlobalScraperContext, product_buffer, from_upload_worker: bool = False): 
     """
     Uploads a list of sanitized product dictionaries to S3 in JSONL format.
     The file is saved to "daily_pricing" folder.
     After successfully saving to s3, product_buffer is cleared.
     On exceeding max_attempts, scraper is paused for a few minutes to save proxy wastage.
+    from_upload_worker: set by the s3 upload workers, which do their own pausing; the upload returns right after the last failed attempt.
     """
     if not product_buffer:
         return  # Avoid uploading an empty list
 
     # Convert products to JSONL format
-    jsonl_content = "\n".join(json.dumps(product) for product in product_buffer)
-    
-    # Generate content hash for the filename
-    content_hash = hashlib.md5(jsonl_content.encode('utf-8')).hexdigest()
+    jsonl_content = encode_jsonl(product_buffer)
     
     # Get current UTC time
     now = datetime.now(timezone.utc)
@@ -193,8 +249,8 @@ async def upload_to_s3_meta(context: GlobalScraperContext, product_buffer):
     # Determine the current quarter number
     quarter = get_current_quarter_number(now)
     
-    # Construct the S3 file paths
-    file_name = f"murtaza2025/metadata/{context.retailer_name.lower()}_metadata/{date_str}-{quarter}/{content_hash}-{uuid.uuid4()}.jsonl"
+    # Construct the S3 file paths (the uuid makes each file name unique)
+    file_name = f"murtaza2025/metadata/{context.retailer_name.lower()}_metadata/{date_str}-{quarter}/{uuid.uuid4()}.jsonl"
     
     # Attempt to upload with retries
     max_attempts = 3
@@ -203,7 +259,7 @@ async def upload_to_s3_meta(context: GlobalScraperContext, product_buffer):
            
             if product_buffer:
                 # Upload file to s3.
-                context.s3_client.put_object(Bucket=context.s3_bucket_name, Key=file_name, Body=jsonl_content)
+                await asyncio.to_thread(put_file_to_s3, context, file_name, jsonl_content)
                 context.logger.log_s3_upload(len(product_buffer), file_name, 'seen', context.proxy_ids[0])
 
                 # Add product URLs to Redis set "retailer_seen_urls", since we now have metadata for these products.
@@ -217,8 +273,108 @@ async def upload_to_s3_meta(context: GlobalScraperContext, product_buffer):
             context.logger.log_processing_error(message=f'S3 upload attempt {current_attempt} failed: {e}', proxy_id=context.proxy_ids[0])
             if current_attempt != max_attempts:
                 # Wait, then retry.
-                await asyncio.sleep(3) 
-            else:
+                await asyncio.sleep(get_retry_delay(current_attempt))
+            elif not from_upload_worker:
                 # If there is an error on uploading to s3 after max_attempts, pause thread for 10 minutes, to save proxy wastage, then return.
                 context.logger.log_processing_error(message=f"Failed to upload to s3 after {max_attempts} attempts.\nPausing worker for 10 minutes to save proxy wastage.", proxy_id=context.proxy_ids[0])
-                await asyncio.sleep(10*60)                      
+                await asyncio.sleep(10*60 + random.uniform(0, 60))
+
+
+
+async def start_s3_upload_workers(context: GlobalScraperContext, num_workers: int = 8, max_queued_buffers: int = 32):
+    """
+    Optional alternative to awaiting upload_to_s3 inline: start background workers that upload the buffers handed over
+    with queue_upload_to_s3, so scraping continues while uploads are in progress.
+    At most max_queued_buffers buffers wait in the queue; beyond that queue_upload_to_s3 waits, slowing scrapers down when s3 is slow.
+    A buffer that still fails after MAX_UPLOAD_ROUNDS rounds of upload attempts is logged and dropped.
+    Call stop_s3_upload_workers before exiting, to finish the queued uploads.
+    """
+    if context.scraper_type not in ('ps', 'meta'):
+        raise ValueError(f"S3 uploads are not supported for scraper_type '{context.scraper_type}'")
+
+    context.s3_upload_queue = asyncio.Queue(maxsize=max_queued_buffers)
+    context.s3_upload_workers = [asyncio.create_task(_s3_upload_worker(context)) for _ in range(num_workers)]
+
+
+
+async def queue_upload_to_s3(context: GlobalScraperContext, product_buffer: list):
+    """
+    Hand over the products in product_buffer to the upload workers (see start_s3_upload_workers), then clear product_buffer.
+    """
+    if not product_buffer:
+        return  # Avoid uploading an empty list
+    if not context.s3_upload_workers:
+        raise RuntimeError('S3 upload workers are not running. Call start_s3_upload_workers before queue_upload_to_s3.')
+
+    await context.s3_upload_queue.put(product_buffer.copy())
+    product_buffer.clear()
+
+
+
+async def stop_s3_upload_workers(context: GlobalScraperContext, timeout: float = 120):
+    """
+    Wait until all queued buffers are uploaded (at most timeout seconds), then stop the upload workers.
+    Buffers still queued or being uploaded after the timeout are logged and dropped, so shutdown does not hang during an s3 outage.
+    """
+    if not context.s3_upload_workers:
+        return
+
+    try:
+        await asyncio.wait_for(context.s3_upload_queue.join(), timeout)
+    except asyncio.TimeoutError:
+        context.logger.log_processing_error(
+            message=f'S3 upload workers did not finish within {timeout} seconds. Dropping the {context.s3_upload_queue.qsize()} queued buffers and the uploads in progress.',
+            proxy_id=context.proxy_ids[0]
+        )
+    for worker in context.s3_upload_workers:
+        worker.cancel()
+    await asyncio.gather(*context.s3_upload_workers, return_exceptions=True)
+    context.s3_upload_workers = None
+    context.s3_upload_queue = None
+
+
+
+async def _s3_upload_worker(context: GlobalScraperContext):
+    """
+    Upload queued buffers one after another.
+    """
+    while True:
+        product_buffer = await context.s3_upload_queue.get()
+        try:
+            await _upload_queued_buffer(context, product_buffer)
+        except Exception as e:
+            context.logger.log_processing_error(message=f'S3 upload worker dropped {len(product_buffer)} products: {e}', proxy_id=context.proxy_ids[0])
+        finally:
+            context.s3_upload_queue.task_done()
+
+
+
+async def _upload_queued_buffer(context: GlobalScraperContext, product_buffer: list):
+    """
+    Upload product_buffer in at most MAX_UPLOAD_ROUNDS rounds (each round makes the upload function's own attempts), pausing between rounds.
+    For 'ps' scrapers the buffer is split into seen/unseen products once, and every round uploads that same split.
+    Raises if the buffer could not be uploaded, so the worker logs and drops it.
+    """
+    if context.scraper_type == 'ps':
+        for current_attempt in range(1, MAX_UPLOAD_ROUNDS+1):
+            try:
+                split_products = await split_unseen_seen_products(context, product_buffer)
+                break
+            except Exception as e:
+                if current_attempt == MAX_UPLOAD_ROUNDS:
+                    raise Exception(f'Failed to split seen/unseen products after {MAX_UPLOAD_ROUNDS} attempts: {e}')
+                await asyncio.sleep(get_retry_delay(current_attempt))
+        upload = lambda: upload_to_s3_ps(context, product_buffer, split_products, from_upload_worker=True)
+    elif context.scraper_type == 'meta':
+        upload = lambda: upload_to_s3_meta(context, product_buffer, from_upload_worker=True)
+    else:
+        raise ValueError(f"S3 uploads are not supported for scraper_type '{context.scraper_type}'")
+
+    for current_round in range(1, MAX_UPLOAD_ROUNDS+1):
+        await upload()
+        if not product_buffer:      # The upload functions clear the buffer once it is uploaded.
+            return
+        if current_round != MAX_UPLOAD_ROUNDS:
+            context.logger.log_processing_error(message="Pausing s3 upload task for 10 minutes before retrying the upload.", proxy_id=context.proxy_ids[0])
+            await asyncio.sleep(10*60 + random.uniform(0, 60))
+    raise Exception(f'Failed to upload to s3 after {MAX_UPLOAD_ROUNDS} rounds of attempts.')
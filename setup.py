@@ -10,7 +10,11 @@ setup(
     install_requires=[
         # e.g. 'boto3>=1.0.0'
     ],
-    python_requires='>=3.7',
+    extras_require={
+        # Faster JSON encoding for EMF logs and S3 uploads. Picked up automatically when installed.
+        'fast': ['orjson>=3.9'],
+    },
+    python_requires='>=3.9',
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
@@ -23,19 +23,29 @@ Future Improvements:
 
 
 import os
-import redis
+import time
+import socket
+import redis.asyncio as aioredis
 import random
 import asyncio
 import aiohttp
 import traceback
-from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+# orjson parses the ipinfo.io responses faster than the stdlib json used by aiohttp by default.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# Minimum number of seconds between two progress prints of an evaluation.
+PROGRESS_PRINT_INTERVAL = 2
+
 
 def get_redis_client():
     print('Connecting to redis...')
-    redis_client = redis.Redis(
+    redis_client = aioredis.Redis(
         host=os.getenv('REDIS_HOST'),
         port=os.getenv('REDIS_PORT'),
         # password=DB_PASS,
@@ -46,7 +56,7 @@ def get_redis_client():
 
 
 
-def load_proxy_subscriptions(redis_client):   
+async def load_proxy_subscriptions(redis_client):   
     '''
     Load all proxy subscriptions from redis and return as a dictionary where:
         - Keys are subsctiption ids
@@ -54,14 +64,16 @@ def load_proxy_subscriptions(redis_client):
     ''' 
     proxy_subscriptions = {} 
     
-    # Get all subscription ids stored on redis.
-    _, keys = redis_client.scan(cursor=0, match="prox*", count=5000)
-    subscription_ids = [key.decode('utf-8') for key in keys]
+    # Get all subscription ids stored on redis (scan_iter follows the cursor until every matching key is returned).
+    subscription_ids = [key.decode('utf-8') async for key in redis_client.scan_iter(match="prox*", count=5000)]
     print(F'Found {len(subscription_ids)} subscription IDs.')
 
-    # Extract IPs for each subcription ID.
-    for id in subscription_ids:
-        ip_list = redis_client.smembers(id)
+    # Extract IPs for each subcription ID, in a single round-trip.
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for id in subscription_ids:
+            pipe.smembers(id)
+        results = await pipe.execute()
+    for id, ip_list in zip(subscription_ids, results):
         ip_list = [p.decode('utf-8') for p in ip_list]
         proxy_subscriptions[id] = ip_list
         print(f'Loaded: {id}')
@@ -71,24 +83,38 @@ def load_proxy_subscriptions(redis_client):
 
 
 
-async def fetch_ip_info(gateway_url, semaphore):
+async def fetch_ip_info(session, gateway_url):
     '''
-    Return ip, subnet, country for a single request.
+    Return ip, subnet, country for a single request. For IPv4, ip and subnet are ints.
     '''
-    async with semaphore:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'https://ipinfo.io/json?val={random.randint(1,10000)}', proxy=gateway_url, timeout=10, ssl=False) as response:
-                if response.status != 200:
-                    raise Exception(f'Invalid status: {response.status}')
-                data = await response.json()
-                ip =  data['ip']
-                subnet = '.'.join(data['ip'].split('.')[0:3])
-                country = data['country']
-                return ip, subnet, country
+    async with session.get(f'https://ipinfo.io/json?val={random.randint(1,10000)}', proxy=gateway_url, timeout=10, ssl=False) as response:
+        if response.status != 200:
+            raise Exception(f'Invalid status: {response.status}')
+        data = await response.json(loads=json_loads)
+        ip =  data['ip']
+        try:
+            # IPv4: ip as a 32-bit int, and its /24 subnet as the top 24 bits (smaller and faster to hash than strings).
+            ip = int.from_bytes(socket.inet_aton(ip), 'big')
+            subnet = ip >> 8
+        except OSError:
+            # Not IPv4 (e.g. IPv6): keep the address as is, and count it as its own subnet.
+            subnet = ip
+        country = data['country']
+        return ip, subnet, country
         
 
 
-async def evaluate_proxy_subscription(subscription_id: str, ip_gateways: list, num_requests_to_test: int, concurrency: int):
+def format_elapsed_time(start_time: float) -> str:
+    '''
+    Return the time elapsed since start_time (a time.monotonic() value) as H:MM:SS.
+    '''
+    minutes, seconds = divmod(int(time.monotonic() - start_time), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+
+
+async def evaluate_proxy_subscription(session, subscription_id: str, ip_gateways: list, num_requests_to_test: int, concurrency: int):
     '''
     Evaulate performance of a single proxy_subscrition_id, and append results to file.
     '''
@@ -98,84 +124,104 @@ async def evaluate_proxy_subscription(subscription_id: str, ip_gateways: list, n
     error_count = 0
     ip_pool = set()
     subnet_pool = set()
-    ip_country_counters = {
-        'US': 0,
-        'Worldwide': 0
-    }
-    start_time = datetime.now()
+    us_ip_count = 0                     # Unique IPs in the US.
+    worldwide_ip_count = 0              # Unique IPs in all other countries.
+    start_time = time.monotonic()
 
 
     print(f'\n\nEvaluating proxy id: {subscription_id}')
-    semaphore = asyncio.Semaphore(concurrency)
-    
-    
+
+    # Gateway proxy urls, built once instead of on every request.
+    gateway_urls = [f'http://{ip_gateway}' for ip_gateway in ip_gateways]
+    requests_left = num_requests_to_test
+    last_print_time = time.monotonic()
+
+    async def worker():
+        '''
+        Make requests one after another until num_requests_to_test have been made, updating stats as each one completes.
+        Running 'concurrency' workers keeps that many requests in flight, without creating all the requests upfront.
+        '''
+        nonlocal requests_left, request_count, success_count, error_count, us_ip_count, worldwide_ip_count, last_print_time
+        while requests_left > 0:
+            requests_left -= 1
+            gateway_url = random.choice(gateway_urls)
+            try:
+                # Retrieve results.
+                ip, subnet, country = await fetch_ip_info(session, gateway_url)
+
+                # Increment request and success count.
+                request_count += 1
+                success_count += 1
+
+                # Increment country counts (before saving ip).
+                if ip not in ip_pool:
+                    if country == 'US':
+                        us_ip_count += 1
+                    else:
+                        worldwide_ip_count += 1
+
+                # Save ip and subnet.
+                ip_pool.add(ip)
+                subnet_pool.add(subnet)
+
+            except Exception:
+                # Increment request and error count.
+                request_count += 1
+                error_count += 1
+
+            # Print results periodically (at most every PROGRESS_PRINT_INTERVAL seconds), in a single write.
+            now = time.monotonic()
+            if now - last_print_time >= PROGRESS_PRINT_INTERVAL:
+                last_print_time = now
+                ip_countries = {'US': us_ip_count, 'Worldwide': worldwide_ip_count}
+                print(
+                    f'\nProxy ID:        {subscription_id}\n'
+                    f"Request Count:   {request_count:,}\n"
+                    f"Success Count:   {success_count:,}\n"
+                    f"Success Rate:    {(success_count / request_count) * 100:,.1f} %\n"
+                    f"Unique IPs:      {len(ip_pool):,}\n"
+                    f"Unique Subnets:  {len(subnet_pool):,}\n"
+                    f"IP Countries:    {ip_countries}\n"
+                    f"Time Taken:      {format_elapsed_time(start_time)}"
+                )
+
     # Make requests as per concurrency and num_requests_to_test.
-    tasks = []
-    for _ in range(num_requests_to_test):
-        gateway_url = f'http://' + random.choice(ip_gateways)
-        tasks.append(fetch_ip_info(gateway_url, semaphore))
-
-    # Process result of each request as soon as it completes.
-    for i, task in enumerate(asyncio.as_completed(tasks), 1):
-        # Increment request count.
-        request_count += 1
-        try:
-            # Retrieve results.
-            ip, subnet, country = await task
-            
-            # Increment success count.
-            success_count += 1
-
-            # Increment country counts (before saving ip).
-            if ip not in ip_pool:
-                if country == 'US':
-                    ip_country_counters['US'] += 1
-                else:
-                    ip_country_counters['Worldwide'] += 1
-
-            # Save ip and subnet.
-            ip_pool.add(ip)
-            subnet_pool.add(subnet)
-        
-        except:
-            # Increment error count.
-            error_count += 1
-        
-        finally:        
-            # Print results periodically.
-            if request_count % 10 == 0:
-                print(f'\nProxy ID:        {subscription_id}')
-                print(f"Request Count:   {request_count:,}")
-                print(f"Success Count:   {success_count:,}")
-                print(f"Success Rate:    {(success_count / request_count) * 100:,.1f} %")
-                print(f"Unique IPs:      {len(ip_pool):,}")
-                print(f"Unique Subnets:  {len(subnet_pool):,}")
-                print(f"IP Countries:    {dict(ip_country_counters)}")
-                print(f"Time Taken:      {str(datetime.now() - start_time).split('.')[0]}")
-           
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    # Build results summary once, then print it and append it to file.
+    ip_countries = {'US': us_ip_count, 'Worldwide': worldwide_ip_count}
+    summary = (
+        f'Proxy ID:        {subscription_id}\n'
+        f"Request Count:   {request_count:,}\n"
+        f"Success Count:   {success_count:,}\n"
+        f"Success Rate:    {(success_count / request_count) * 100:,.1f} %\n"
+        f"Unique IPs:      {len(ip_pool):,}\n"
+        f"Unique Subnets:  {len(subnet_pool):,}\n"
+        f"IP Countries:    {ip_countries}\n"
+        f"Time Taken:      {format_elapsed_time(start_time)}\n"
+    )
 
     # Print results at end of evaluation.
     print("\n\n------------------------------------------------------ Proxy Final Summary ------------------------------------------------------")
-    print(f'Proxy ID:        {subscription_id}')
-    print(f"Request Count:   {request_count:,}")
-    print(f"Success Count:   {success_count:,}")
-    print(f"Success Rate:    {(success_count / request_count) * 100:,.1f} %")
-    print(f"Unique IPs:      {len(ip_pool):,}")
-    print(f"Unique Subnets:  {len(subnet_pool):,}")
-    print(f"IP Countries:    {dict(ip_country_counters)}")
-    print(f"Time Taken:      {str(datetime.now() - start_time).split('.')[0]}")
+    print(summary, end='')
     print("---------------------------------------------------------------------------------------------------------------------------------")
 
-    # Write results to file.
+    # Write results to file, in a single write (results of finished subscriptions are kept even if the tool is stopped midway).
     with open('proxy_evaluation_results.txt', 'a', encoding='utf-8') as f:
-        f.write(f'Proxy ID:        {subscription_id}\n')
-        f.write(f"Request Count:   {request_count:,}\n")
-        f.write(f"Success Count:   {success_count:,}\n")
-        f.write(f"Success Rate:    {(success_count / request_count) * 100:,.1f} %\n")
-        f.write(f"Unique IPs:      {len(ip_pool):,}\n")
-        f.write(f"Unique Subnets:  {len(subnet_pool):,}\n")
-        f.write(f"IP Countries:    {dict(ip_country_counters)}\n")
-        f.write(f"Time Taken:      {str(datetime.now() - start_time).split('.')[0]}\n\n\n\n")
+        f.write(summary + '\n\n\n')
+
+
+
+
+def get_dns_resolver():
+    '''
+    Return aiohttp's aiodns-based resolver if aiodns is installed (lookups run on the event loop instead of a thread pool).
+    Otherwise return None, so that aiohttp uses its default resolver.
+    '''
+    try:
+        return aiohttp.AsyncResolver()
+    except RuntimeError:      # aiodns is not installed.
+        return None
 
 
 
@@ -189,29 +235,51 @@ async def main():
     # Load all proxy subscriptions from redis.
     load_dotenv()
     redis_client = get_redis_client()
-    proxy_subscriptions = load_proxy_subscriptions(redis_client)
-    redis_client.close()
+    proxy_subscriptions = await load_proxy_subscriptions(redis_client)
+    # aclose() was added in redis-py 5.0.1; older versions only have close().
+    close_redis_client = getattr(redis_client, 'aclose', None) or redis_client.close
+    await close_redis_client()
 
 
     input("\nPlease disconnect OpenVPN (some proxies don't work with it), then press enter:")         # Geonode does not work with OpenVPN.
 
-    # Evaluate each proxy subscription.
-    tasks = []
-    for subscription_id, ip_gateways in proxy_subscriptions.items():
-        task = asyncio.create_task(
-            evaluate_proxy_subscription(
-                subscription_id=subscription_id, 
-                ip_gateways=ip_gateways,
-                num_requests_to_test=100_000,
-                concurrency=10
+    # One session shared by all evaluations, so the session, connector and DNS cache are not rebuilt on every request.
+    # force_close: every request still opens a new connection (and so a new proxy tunnel), because a reused tunnel would
+    # keep the same exit IP and undercount the unique IPs/subnets of rotating gateways.
+    # The connector caps open connections at the total concurrency (and per gateway at the per-subscription concurrency), and caches DNS lookups.
+    concurrency = 10
+    connector = aiohttp.TCPConnector(
+        limit=concurrency * max(len(proxy_subscriptions), 1),
+        limit_per_host=concurrency,
+        ttl_dns_cache=300,
+        resolver=get_dns_resolver(),
+        force_close=True,
+    )
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        # Evaluate each proxy subscription.
+        tasks = []
+        for subscription_id, ip_gateways in proxy_subscriptions.items():
+            task = asyncio.create_task(
+                evaluate_proxy_subscription(
+                    session=session,
+                    subscription_id=subscription_id, 
+                    ip_gateways=ip_gateways,
+                    num_requests_to_test=100_000,
+                    concurrency=concurrency
+                )
             )
-        )
-        tasks.append(task)
+            tasks.append(task)
 
-    await asyncio.gather(*tasks)
+        await asyncio.gather(*tasks)
         
     print('\nAll results saved!')
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    # uvloop is optional: a faster event loop when installed (uvloop.run needs uvloop >= 0.18), default asyncio loop otherwise.
+    try:
+        from uvloop import run
+    except ImportError:
+        run = asyncio.run
+    run(main())
     
\ No newline at end of file